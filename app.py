@@ -1,46 +1,85 @@
-from flask import Flask, request, jsonify, render_template
-from utils.aibrain_client import generate_itinerary, clear_cache, TravelAssistantError
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from utils.aibrain_client import generate_itinerary, stream_itinerary, clear_cache, TravelAssistantError
+from utils.logging_config import configure_logging
+from flask_compress import Compress
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+import hashlib
 import logging
-from typing import Dict, Any
+import orjson
+from typing import Dict, Any, Optional, Tuple
 import os
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('travel_assistant.log'),
-        logging.StreamHandler()
-    ]
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider that encodes and decodes with orjson.
+
+    Dates are passed through to Flask's default() hook so they keep the
+    HTTP-date format. The json.dumps keyword arguments (sort_keys,
+    ensure_ascii, indent) are ignored.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(
+            obj,
+            default=self.default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        ).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
 app = Flask(__name__)
 
-# Configure rate limiting
+# Serialize responses and parse request bodies with orjson
+app.json = OrjsonProvider(app)
+
+# Compress responses; streamed itineraries are sent uncompressed so events arrive as generated
+app.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+app.config["COMPRESS_MIN_SIZE"] = 512
+app.config["COMPRESS_STREAMS"] = False
+Compress(app)
+
+def rate_limit_key() -> str:
+    """Return the client address, hashed to 16 characters when longer (IPv6)."""
+    address = get_remote_address()
+    if len(address) <= 16:
+        return address
+    return hashlib.blake2b(address.encode(), digest_size=8).hexdigest()
+
+# Configure rate limiting (shared across workers through Redis)
 limiter = Limiter(
     app=app,
-    key_func=get_remote_address,
+    key_func=rate_limit_key,
+    storage_uri=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+    strategy="moving-window",
+    in_memory_fallback_enabled=True,
     default_limits=["200 per day", "50 per hour"]
 )
 
-def format_error_response(error: str, status_code: int) -> tuple[Dict[str, Any], int]:
+# Both itinerary routes call Gemini, so they draw on one budget per client
+generate_limit = limiter.shared_limit("10 per minute", scope="generate-itinerary")
+
+def format_error_response(error: str, status_code: int) -> Response:
     """Format error responses consistently."""
-    return jsonify({
+    return Response(orjson.dumps({
         "status": "error",
         "message": error,
         "status_code": status_code
-    }), status_code
+    }), status=status_code, mimetype="application/json")
 
-def format_success_response(data: Dict[str, Any]) -> tuple[Dict[str, Any], int]:
+def format_success_response(data: Dict[str, Any]) -> Response:
     """Format success responses consistently."""
-    return jsonify({
+    return Response(orjson.dumps({
         "status": "success",
         "data": data,
         "status_code": 200
-    }), 200
+    }), status=200, mimetype="application/json")
 
 @app.route('/')
 def index():
@@ -59,6 +98,7 @@ def api_docs():
             "GET /api/docs": "This documentation",
             "GET /health": "Health check",
             "POST /generate-itinerary": "Generate travel itinerary",
+            "POST /generate-itinerary/stream": "Stream travel itinerary as server-sent events",
             "POST /clear-cache": "Clear cache"
         },
         "usage": {
@@ -74,6 +114,12 @@ def api_docs():
                     "language": "en"
                 }
             },
+            "generate_itinerary_stream": {
+                "method": "POST",
+                "url": "/generate-itinerary/stream",
+                "description": "Same body as /generate-itinerary; responds with text/event-stream "
+                               "'chunk' events carrying itinerary text, then a 'done' or 'error' event"
+            },
             "clear_cache": {
                 "method": "POST",
                 "url": "/clear-cache",
@@ -82,53 +128,93 @@ def api_docs():
         },
         "rate_limits": {
             "default": "200 per day, 50 per hour",
-            "generate_itinerary": "10 per minute",
+            "generate_itinerary": "10 per minute, shared with generate_itinerary_stream",
             "clear_cache": "5 per hour"
         }
     })
 
-@app.route('/generate-itinerary', methods=['POST'])
-@limiter.limit("10 per minute")
-def itinerary():
+DEFAULT_PREFERENCES = "sightseeing, food, public transportation"
+SUPPORTED_LANGUAGES = frozenset({'en', 'es', 'fr', 'de', 'it', 'ja', 'zh'})
+SUPPORTED_LANGUAGES_MESSAGE = "Unsupported language. Supported languages: en, es, fr, de, it, ja, zh"
+
+class InvalidRequestError(Exception):
+    """Raised when an itinerary request body fails validation."""
+    pass
+
+def _classify_request_error(destination: Any, days: Any, preferences: Any, language: Any) -> str:
+    """Work out which validation rule an itinerary request broke."""
+    if not destination or not days:
+        return "Missing required fields: destination and days"
+
     try:
-        data = request.get_json()
-        
-        if not data:
-            return format_error_response("No JSON data provided", 400)
-            
-        destination = data.get("destination")
-        days = data.get("days")
-        preferences = data.get("preferences", "sightseeing, food, public transportation")
-        language = data.get("language", "en")
+        days = int(days)
+    except ValueError:
+        return "Days must be a valid integer"
 
-        if not destination or not days:
-            return format_error_response("Missing required fields: destination and days", 400)
+    if not isinstance(destination, str) or len(destination.strip()) == 0:
+        return "Destination must be a non-empty string"
+    
+    if days < 1 or days > 30:
+        return "Days must be between 1 and 30"
 
-        try:
-            days = int(days)
-        except ValueError:
-            return format_error_response("Days must be a valid integer", 400)
+    if len(destination) > 100:
+        return "Destination name is too long (max 100 characters)"
 
-        # Additional input validation
-        if not isinstance(destination, str) or len(destination.strip()) == 0:
-            return format_error_response("Destination must be a non-empty string", 400)
+    if len(preferences) > 500:
+        return "Preferences text is too long (max 500 characters)"
+
+    return SUPPORTED_LANGUAGES_MESSAGE
+
+def parse_itinerary_request(data: Optional[Dict[str, Any]]) -> Tuple[str, int, str, str]:
+    """
+    Extract and validate itinerary parameters from a request body.
+    
+    Returns:
+        Tuple of (destination, days, preferences, language)
+        
+    Raises:
+        InvalidRequestError: If the body is missing or invalid
+    """
+    if not data:
+        raise InvalidRequestError("No JSON data provided")
         
-        if days < 1 or days > 30:
-            return format_error_response("Days must be between 1 and 30", 400)
+    destination = data.get("destination")
+    days = data.get("days")
+    preferences = data.get("preferences", DEFAULT_PREFERENCES)
+    language = data.get("language", "en")
+
+    try:
+        days_value = int(days) if days else 0
+    except (TypeError, ValueError):
+        days_value = 0
 
-        if len(destination) > 100:
-            return format_error_response("Destination name is too long (max 100 characters)", 400)
+    # One combined check; the specific error is only worked out on failure
+    if not (
+        isinstance(destination, str)
+        and destination.strip()
+        and 1 <= days_value <= 30
+        and len(destination) <= 100
+        and len(preferences) <= 500
+        and language in SUPPORTED_LANGUAGES
+    ):
+        raise InvalidRequestError(_classify_request_error(destination, days, preferences, language))
 
-        if len(preferences) > 500:
-            return format_error_response("Preferences text is too long (max 500 characters)", 400)
+    return destination, days_value, preferences, language
 
-        supported_languages = {'en', 'es', 'fr', 'de', 'it', 'ja', 'zh'}
-        if language not in supported_languages:
-            return format_error_response(f"Unsupported language. Supported languages: {', '.join(supported_languages)}", 400)
+def format_stream_event(event: str, data: Dict[str, Any]) -> bytes:
+    """Encode a single server-sent event."""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
 
+@app.route('/generate-itinerary', methods=['POST'])
+@generate_limit
+def itinerary():
+    try:
+        destination, days, preferences, language = parse_itinerary_request(request.get_json())
         result = generate_itinerary(destination, days, preferences, language)
         return format_success_response(result)
         
+    except InvalidRequestError as ie:
+        return format_error_response(str(ie), 400)
     except TravelAssistantError as te:
         logger.warning(f"Travel assistant error: {str(te)}")
         return format_error_response(str(te), 400)
@@ -136,6 +222,37 @@ def itinerary():
         logger.error(f"Unexpected error: {str(e)}", exc_info=True)
         return format_error_response("An unexpected error occurred", 500)
 
+@app.route('/generate-itinerary/stream', methods=['POST'])
+@generate_limit
+def itinerary_stream():
+    """Stream an itinerary as server-sent events while it is generated."""
+    try:
+        destination, days, preferences, language = parse_itinerary_request(request.get_json())
+        chunks = stream_itinerary(destination, days, preferences, language)
+    except InvalidRequestError as ie:
+        return format_error_response(str(ie), 400)
+    except TravelAssistantError as te:
+        logger.warning(f"Travel assistant error: {str(te)}")
+        return format_error_response(str(te), 400)
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        return format_error_response("An unexpected error occurred", 500)
+
+    def events():
+        try:
+            for chunk in chunks:
+                yield format_stream_event("chunk", {"text": chunk})
+            yield format_stream_event("done", {"status": "success"})
+        except TravelAssistantError as te:
+            logger.warning(f"Travel assistant error: {str(te)}")
+            yield format_stream_event("error", {"status": "error", "message": str(te)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route('/clear-cache', methods=['POST'])
 @limiter.limit("5 per hour")
 def clear_itinerary_cache():
@@ -169,4 +286,5 @@ def internal_error(e):
     return format_error_response("Internal server error", 500)
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Debugger and reloader only in development; production runs under gunicorn
+    app.run(debug=os.getenv("FLASK_ENV") == "development")
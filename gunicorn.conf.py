@@ -0,0 +1,17 @@
+import multiprocessing
+import os
+
+# Gunicorn settings for production (`gunicorn -c gunicorn.conf.py app:app`)
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = 8
+keepalive = 30
+
+# Import the app once in the master and fork-share it with the workers
+preload_app = True
+
+def worker_exit(server, worker):
+    """Flush buffered log records before a worker exits."""
+    from utils.logging_config import shutdown_logging
+    shutdown_logging()
@@ -2,21 +2,15 @@ from google import generativeai as genai
 import os
 from dotenv import load_dotenv
 import logging
-from functools import lru_cache
+from functools import cache
 import json
-from typing import Dict, Any, Optional
-from datetime import datetime
+from typing import Dict, Any, Iterator, Optional, Tuple
+from datetime import datetime, timezone
 import re
+import hashlib
+import orjson
+import redis
 
-# Configure logging with more detailed format
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('travel_assistant.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -28,22 +22,62 @@ if not GOOGLE_API_KEY:
 # Initialize Gemini
 genai.configure(api_key=GOOGLE_API_KEY)
 
-# List available models and verify access
-try:
-    for m in genai.list_models():
-        logger.info(f"Available model: {m.name}")
-except Exception as e:
-    logger.error(f"Error listing models: {str(e)}")
-    raise ValueError("Unable to access Gemini API. Please verify your API key and permissions.")
+# Shared itinerary cache (one pool per worker process)
+CACHE_PREFIX = "itin:"
+CACHE_TTL_SECONDS = 86400
+_redis_pool = redis.ConnectionPool.from_url(
+    os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+    max_connections=50
+)
+_redis = redis.Redis(connection_pool=_redis_pool)
 
-# Select the most appropriate model
+# Preferred model; availability is verified lazily on first use
 GEMINI_MODEL = "gemini-1.5-pro"  # Using a stable version
-for model in genai.list_models():
-    if model.name == "models/gemini-1.5-pro":
-        GEMINI_MODEL = "gemini-1.5-pro"
-        break
+GENERATION_CONFIG = genai.types.GenerationConfig(
+    temperature=0.7,
+    top_p=0.8,
+    top_k=40,
+    max_output_tokens=2048,
+)
+
+@cache
+def _select_model() -> str:
+    """
+    Verify API access and select the most appropriate model.
+
+    Runs a single list_models() round trip on first use instead of at import.
 
-logger.info(f"Selected model: {GEMINI_MODEL}")
+    Returns:
+        Name of the selected Gemini model
+
+    Raises:
+        ValueError: If the Gemini API cannot be reached
+    """
+    try:
+        available = {m.name for m in genai.list_models()}
+    except Exception as e:
+        logger.error(f"Error listing models: {str(e)}")
+        raise ValueError("Unable to access Gemini API. Please verify your API key and permissions.")
+
+    if f"models/{GEMINI_MODEL}" not in available:
+        logger.warning(f"Model {GEMINI_MODEL} not listed as available, using it anyway")
+    logger.info(f"Selected model: {GEMINI_MODEL}")
+    return GEMINI_MODEL
+
+@cache
+def _get_model() -> genai.GenerativeModel:
+    """Return the shared GenerativeModel, created once per process."""
+    return genai.GenerativeModel(_select_model(), generation_config=GENERATION_CONFIG)
+
+# Section headings in the model output, with or without a "## " the model
+# wrote itself; sections are split on the line break before each heading.
+# The character class lets the engine reject most line breaks before trying
+# the alternation.
+_SECTION_HEADINGS = ('Day ', 'Overview:', 'Essential Tips:', 'Budget Considerations:', 'Safety Tips:', 'Local Customs:')
+_SECTION_RE = re.compile(
+    r'\n(?=[#DOEBSL])(?=(?:## )?(?:Day \d+:|Overview:|Essential Tips:|Budget Considerations:|Safety Tips:|Local Customs:))'
+)
+_DAY_RE = re.compile(r'Day \d+:')
 
 class TravelAssistantError(Exception):
     """Custom exception for travel assistant errors."""
@@ -57,10 +91,25 @@ def format_time_range(start_time: str, end_time: str) -> str:
     """Format time ranges consistently."""
     return f"{start_time} - {end_time}"
 
+def _classify_invalid_inputs(destination: Any, days: Any, preferences: Any) -> str:
+    """Return the error message for the first validation rule the inputs break."""
+    if type(destination) is not str or not destination.strip():
+        return "Destination must be a non-empty string"
+    if type(days) is not int or days < 1 or days > 30:
+        return "Days must be an integer between 1 and 30"
+    if type(preferences) is not str:
+        return "Preferences must be a string"
+    if len(destination) > 100:
+        return "Destination name is too long (max 100 characters)"
+    return "Preferences text is too long (max 500 characters)"
+
 def validate_inputs(destination: str, days: int, preferences: str) -> None:
     """
     Validate input parameters with detailed error messages.
     
+    All rules are checked in one expression; the specific message is only
+    worked out when validation fails.
+    
     Args:
         destination: The travel destination
         days: Number of days for the trip
@@ -69,20 +118,16 @@ def validate_inputs(destination: str, days: int, preferences: str) -> None:
     Raises:
         TravelAssistantError: If validation fails
     """
-    if not isinstance(destination, str) or not destination.strip():
-        raise TravelAssistantError("Destination must be a non-empty string")
-    if not isinstance(days, int) or days < 1 or days > 30:
-        raise TravelAssistantError("Days must be an integer between 1 and 30")
-    if not isinstance(preferences, str):
-        raise TravelAssistantError("Preferences must be a string")
-    
-    # Additional validation for destination
-    if len(destination) > 100:
-        raise TravelAssistantError("Destination name is too long (max 100 characters)")
-    
-    # Additional validation for preferences
-    if len(preferences) > 500:
-        raise TravelAssistantError("Preferences text is too long (max 500 characters)")
+    if (
+        type(destination) is not str
+        or not destination.strip()
+        or type(days) is not int
+        or not 1 <= days <= 30
+        or type(preferences) is not str
+        or len(destination) > 100
+        or len(preferences) > 500
+    ):
+        raise TravelAssistantError(_classify_invalid_inputs(destination, days, preferences))
 
 def format_itinerary_response(raw_response: str) -> str:
     """
@@ -95,52 +140,55 @@ def format_itinerary_response(raw_response: str) -> str:
         Formatted itinerary text
     """
     # Split into sections
-    sections = re.split(r'\n(?=Day \d+:|Overview:|Essential Tips:|Budget Considerations:|Safety Tips:|Local Customs:)', raw_response)
+    sections = _SECTION_RE.split(raw_response)
     
     formatted_sections = []
     
     for section in sections:
         section = section.strip()
         if section:
-            # Add proper markdown formatting
-            if section.startswith(('Day ', 'Overview:', 'Essential Tips:', 'Budget Considerations:', 'Safety Tips:', 'Local Customs:')):
-                section = f"## {section}"
+            # Add proper markdown formatting, with horizontal rules between days
+            body = section[3:] if section.startswith('## ') else section
+            if body.startswith(_SECTION_HEADINGS):
+                if not body.startswith('Day '):
+                    section = f"## {body}"
+                elif _DAY_RE.match(body):
+                    section = f"---\n## {body}" if formatted_sections else f"## {body}"
             formatted_sections.append(section)
     
     # Join sections with proper spacing
-    formatted_text = "\n\n".join(formatted_sections)
-    
-    # Add horizontal rules between days
-    formatted_text = re.sub(r'(\n## Day \d+:)', r'\n---\1', formatted_text)
-    
-    return formatted_text
+    return "\n\n".join(formatted_sections)
 
-@lru_cache(maxsize=100)
-def generate_itinerary(
-    destination: str, 
-    days: int, 
-    preferences: str,
-    language: str = "en"
-) -> Dict[str, Any]:
+def _cache_key(destination: str, days: int, preferences: str, language: str) -> str:
+    """Build a fixed-length Redis key for an itinerary request."""
+    # JSON-encode the fields so no combination of inputs can collide
+    raw = orjson.dumps([destination, days, preferences, language])
+    return CACHE_PREFIX + hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    """Return a cached itinerary, or None on a miss or Redis failure."""
+    try:
+        cached = _redis.get(key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache lookup failed: {str(e)}")
+        return None
+    return orjson.loads(cached) if cached is not None else None
+
+def _cache_set(key: str, result: Dict[str, Any]) -> None:
+    """Store an itinerary in the cache, ignoring Redis failures."""
+    try:
+        _redis.set(key, orjson.dumps(result), ex=CACHE_TTL_SECONDS)
+    except redis.RedisError as e:
+        logger.warning(f"Cache store failed: {str(e)}")
+
+def _build_prompts(destination: str, days: int, preferences: str, language: str) -> Tuple[str, str]:
     """
-    Generate a travel itinerary using Google's Gemini AI with caching.
+    Build the system and user prompts for an itinerary request.
     
-    Args:
-        destination: The travel destination
-        days: Number of days for the trip
-        preferences: User preferences for the trip
-        language: Language code for the response (default: "en")
-        
     Returns:
-        Dict containing the itinerary and metadata
-        
-    Raises:
-        TravelAssistantError: If generation fails
+        Tuple of (system_prompt, user_prompt)
     """
-    try:
-        validate_inputs(destination, days, preferences)
-        
-        system_prompt = f"""You are an expert travel assistant that creates detailed and personalized travel itineraries.
+    system_prompt = f"""You are an expert travel assistant that creates detailed and personalized travel itineraries.
         Focus on providing practical, well-structured information in the following format:
 
         Overview:
@@ -180,84 +228,175 @@ def generate_itinerary(
         Format all costs in {format_currency(0, "USD")} format.
         Format all time ranges as {format_time_range("HH:MM", "HH:MM")}.
         Provide the response in {language} language."""
-        
-        user_prompt = (
-            f"Create a detailed {days}-day itinerary for {destination}. "
-            f"Travel preferences: {preferences}. "
-            "Include specific recommendations for attractions, restaurants, and activities. "
-            "Add estimated costs and practical travel tips. "
-            "Also include local customs and etiquette tips."
+    
+    user_prompt = (
+        f"Create a detailed {days}-day itinerary for {destination}. "
+        f"Travel preferences: {preferences}. "
+        "Include specific recommendations for attractions, restaurants, and activities. "
+        "Add estimated costs and practical travel tips. "
+        "Also include local customs and etiquette tips."
+    )
+
+    return system_prompt, user_prompt
+
+def _generate_itinerary_cached(
+    destination: str,
+    days: int,
+    preferences: str,
+    language: str
+) -> Dict[str, Any]:
+    """
+    Return the itinerary for already-validated inputs, from the cache if present.
+    
+    On a cache miss the itinerary is generated with Gemini and stored.
+    """
+    key = _cache_key(destination, days, preferences, language)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    system_prompt, user_prompt = _build_prompts(destination, days, preferences, language)
+
+    # Reuse the shared model instance
+    model_name = _select_model()
+    model = _get_model()
+
+    try:
+        # Generate content with proper parameters
+        response = model.generate_content(
+            contents=[
+                {"role": "user", "parts": [{"text": system_prompt}]},
+                {"role": "user", "parts": [{"text": user_prompt}]}
+            ]
         )
 
-        try:
-            # Configure the model
-            model = genai.GenerativeModel(GEMINI_MODEL)
-            
-            # Generate content with proper parameters
-            response = model.generate_content(
-                contents=[
-                    {"role": "user", "parts": [{"text": system_prompt}]},
-                    {"role": "user", "parts": [{"text": user_prompt}]}
-                ],
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    top_p=0.8,
-                    top_k=40,
-                    max_output_tokens=2048,
-                )
-            )
-
-            # Format the response
-            formatted_itinerary = format_itinerary_response(response.text)
-
-            # Log the generation
-            logger.info(f"Generated itinerary for {destination} ({days} days)")
-
-            return {
-                "itinerary": formatted_itinerary,
-                "metadata": {
-                    "destination": destination,
-                    "days": days,
-                    "preferences": preferences,
-                    "language": language,
-                    "model": GEMINI_MODEL,
-                    "prompt_tokens": len(system_prompt + user_prompt) // 4,  # Approximate token count
-                    "generated_at": datetime.utcnow().isoformat(),
-                    "version": "1.1.0"
-                }
+        # Format the response
+        formatted_itinerary = format_itinerary_response(response.text)
+
+        # Log the generation
+        logger.info(f"Generated itinerary for {destination} ({days} days)")
+
+        result = {
+            "itinerary": formatted_itinerary,
+            "metadata": {
+                "destination": destination,
+                "days": days,
+                "preferences": preferences,
+                "language": language,
+                "model": model_name,
+                "prompt_tokens": (len(system_prompt) + len(user_prompt)) // 4,  # Approximate token count
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "version": "1.1.0"
             }
-        except Exception as model_error:
-            logger.error(f"Model error: {str(model_error)}")
-            # Try fallback with simpler prompt
-            response = model.generate_content(
-                contents=[{"text": user_prompt}],
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    top_p=0.8,
-                    top_k=40,
-                    max_output_tokens=2048,
-                )
-            )
-            return {
-                "itinerary": response.text,
-                "metadata": {
-                    "destination": destination,
-                    "days": days,
-                    "preferences": preferences,
-                    "language": language,
-                    "model": GEMINI_MODEL,
-                    "prompt_tokens": len(user_prompt) // 4,
-                    "generated_at": datetime.utcnow().isoformat(),
-                    "version": "1.1.0",
-                    "fallback": True
-                }
+        }
+    except Exception as model_error:
+        logger.error(f"Model error: {str(model_error)}")
+        # Try fallback with simpler prompt
+        response = model.generate_content(
+            contents=[{"text": user_prompt}]
+        )
+        result = {
+            "itinerary": response.text,
+            "metadata": {
+                "destination": destination,
+                "days": days,
+                "preferences": preferences,
+                "language": language,
+                "model": model_name,
+                "prompt_tokens": len(user_prompt) // 4,
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "version": "1.1.0",
+                "fallback": True
             }
+        }
+
+    _cache_set(key, result)
+    return result
+
+def generate_itinerary(
+    destination: str, 
+    days: int, 
+    preferences: str,
+    language: str = "en"
+) -> Dict[str, Any]:
+    """
+    Generate a travel itinerary using Google's Gemini AI with a shared Redis cache.
+    
+    Args:
+        destination: The travel destination
+        days: Number of days for the trip
+        preferences: User preferences for the trip
+        language: Language code for the response (default: "en")
         
+    Returns:
+        Dict containing the itinerary and metadata
+        
+    Raises:
+        TravelAssistantError: If generation fails
+    """
+    try:
+        validate_inputs(destination, days, preferences)
+        return _generate_itinerary_cached(destination, days, preferences, language)
+
     except Exception as e:
         logger.error(f"Error generating itinerary: {str(e)}", exc_info=True)
         raise TravelAssistantError(f"Failed to generate itinerary: {str(e)}")
 
+def stream_itinerary(
+    destination: str,
+    days: int,
+    preferences: str,
+    language: str = "en"
+) -> Iterator[str]:
+    """
+    Stream a travel itinerary from Google's Gemini AI as it is generated.
+    
+    Inputs are validated before the request is sent, so invalid input fails
+    immediately rather than part-way through the stream. Streamed output is
+    passed through as-is and is not cached.
+    
+    Args:
+        destination: The travel destination
+        days: Number of days for the trip
+        preferences: User preferences for the trip
+        language: Language code for the response (default: "en")
+        
+    Returns:
+        Iterator over chunks of itinerary text
+        
+    Raises:
+        TravelAssistantError: If validation or generation fails
+    """
+    try:
+        validate_inputs(destination, days, preferences)
+        system_prompt, user_prompt = _build_prompts(destination, days, preferences, language)
+        response = _get_model().generate_content(
+            contents=[
+                {"role": "user", "parts": [{"text": system_prompt}]},
+                {"role": "user", "parts": [{"text": user_prompt}]}
+            ],
+            stream=True
+        )
+    except Exception as e:
+        logger.error(f"Error starting itinerary stream: {str(e)}", exc_info=True)
+        raise TravelAssistantError(f"Failed to generate itinerary: {str(e)}")
+
+    def chunks() -> Iterator[str]:
+        try:
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            logger.error(f"Error streaming itinerary: {str(e)}", exc_info=True)
+            raise TravelAssistantError(f"Failed to generate itinerary: {str(e)}")
+        logger.info(f"Streamed itinerary for {destination} ({days} days)")
+
+    return chunks()
+
 def clear_cache() -> None:
     """Clear the itinerary generation cache."""
-    generate_itinerary.cache_clear()
+    pipe = _redis.pipeline(transaction=False)
+    for key in _redis.scan_iter(f"{CACHE_PREFIX}*"):
+        pipe.delete(key)
+    pipe.execute()
     logger.info("Cache cleared successfully")
@@ -0,0 +1,143 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from typing import Optional
+
+LOG_FILE = 'travel_assistant.log'
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+class BufferedFileHandler(logging.FileHandler):
+    """
+    File handler that batches writes instead of flushing after every record.
+
+    The file is opened with a large write buffer and flushed once
+    `flush_records` records are pending or `flush_interval` seconds after
+    the first unflushed record, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        mode: str = 'a',
+        encoding: Optional[str] = None,
+        buffer_size: int = 64 * 1024,
+        flush_records: int = 100,
+        flush_interval: float = 1.0
+    ) -> None:
+        self.buffer_size = buffer_size
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._timer: Optional[threading.Timer] = None
+        super().__init__(filename, mode, encoding)
+
+    def _open(self):
+        return open(
+            self.baseFilename,
+            self.mode,
+            buffering=self.buffer_size,
+            encoding=self.encoding,
+            errors=self.errors
+        )
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+            return
+
+        self._pending += 1
+        if self._pending >= self.flush_records:
+            self.flush()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _at_fork_reinit(self) -> None:
+        # Called by logging in a forked child; the parent's timer thread is gone
+        super()._at_fork_reinit()
+        self._timer = None
+        self._pending = 0
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = 0
+            super().flush()
+        finally:
+            self.release()
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """
+    Route all logging through a queue so request threads never block on I/O.
+
+    Records are enqueued by a QueueHandler on the root logger and written to
+    the log file (in batches) and stderr by a single background QueueListener.
+    Calling this more than once is a no-op.
+
+    Args:
+        level: Root logger level (default: logging.INFO)
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = BufferedFileHandler(LOG_FILE)
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    _queue_handler = logging.handlers.QueueHandler(queue.Queue(-1))
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+
+    _listener = logging.handlers.QueueListener(
+        _queue_handler.queue, file_handler, stream_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging() -> None:
+    """Stop the listener thread and flush any buffered records."""
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.flush()
+
+def _flush_before_fork() -> None:
+    # Flush buffered output so a forked child does not write it a second time
+    if _listener is not None:
+        for handler in _listener.handlers:
+            handler.flush()
+
+def _restart_after_fork() -> None:
+    # The listener thread does not survive fork (e.g. gunicorn --preload), and
+    # the queue's lock may have been held by it, so give the child fresh ones
+    global _listener
+    if _listener is None:
+        return
+    _queue_handler.queue = queue.Queue(-1)
+    _listener = logging.handlers.QueueListener(
+        _queue_handler.queue, *_listener.handlers, respect_handler_level=True
+    )
+    _listener.start()
+
+os.register_at_fork(before=_flush_before_fork, after_in_child=_restart_after_fork)